@@ -0,0 +1,123 @@
+'''
+Cost of deriving usage for the whole fleet
+
+Compares, on the sample inspect and stats payloads of the payloads
+directory, the former per-container path (the info dict and the
+_get_cpu_stats, _get_memory_stats and _get_network_stats dicts) with the
+current one: DockerContainerAPI.get_stats writing the counters in place
+into the FleetStats rows, then one batched FleetStats.update. The Docker
+calls themselves are not included, the payloads are answered as is.
+
+Needs the integration requirements and Home Assistant installed.
+Run with: python benchmarks/fleet_update.py
+'''
+import copy
+import json
+import os
+import sys
+import timeit
+
+from docker.models.containers import Container
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import legacy  # noqa: E402
+from custom_components.docker_monitor import DockerContainerAPI  # noqa: E402
+from custom_components.docker_monitor.stats import FleetStats  # noqa: E402
+
+PAYLOADS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'payloads')
+with open(os.path.join(PAYLOADS, 'container_inspect.json')) as payload:
+    INSPECT = json.load(payload)
+with open(os.path.join(PAYLOADS, 'container_stats.json')) as payload:
+    STATS = json.load(payload)
+IMAGE_TAGS = ['homeassistant/home-assistant:stable']
+
+CYCLES = 10
+
+
+def build_raws(count, cycle):
+    raws = []
+    for index in range(count):
+        raw = copy.deepcopy(STATS)
+        raw['read'] = '2024-03-12T08:{:02d}:{:02d}.000000000Z'.format(cycle // 60, cycle % 60)
+        raw['cpu_stats']['cpu_usage']['total_usage'] += cycle * 10 ** 7 + index
+        raw['networks']['eth0']['tx_bytes'] += cycle * 1000 * index
+        raw['networks']['eth0']['rx_bytes'] += cycle * 2000 * index
+        raws.append(raw)
+    return raws
+
+
+class PayloadAPI:
+    """Low-level API answering with the prepared payloads, without copying them."""
+
+    def __init__(self, index):
+        self.attrs = dict(INSPECT, Id='{:064x}'.format(index))
+        self.raw = None
+
+    def inspect_container(self, name):
+        return self.attrs
+
+    def inspect_image(self, image):
+        return {'RepoTags': list(IMAGE_TAGS)}
+
+    def stats(self, container, stream):
+        return self.raw
+
+
+class PayloadClient:
+    def __init__(self, index):
+        self.api = PayloadAPI(index)
+
+
+def run_legacy(containers, raws, previous_networks):
+    for index, (container, raw) in enumerate(zip(containers, raws)):
+        stats, previous_networks[index] = legacy.get_usage(raw, previous_networks[index])
+        stats['info'] = legacy.get_info(container, IMAGE_TAGS[0])
+
+
+def run_current(containers, fleet, raws):
+    for container, raw in zip(containers, raws):
+        container._client.api.raw = raw
+        container.get_stats()
+    fleet.update()
+
+
+def build_legacy(count):
+    return [Container(attrs=PayloadAPI(index).attrs) for index in range(count)]
+
+
+def build_current(count):
+    containers = [
+        DockerContainerAPI(None, PayloadClient(index), 'container_{}'.format(index))
+        for index in range(count)
+    ]
+    return containers, FleetStats([container.stats for container in containers])
+
+
+def main():
+    print("Containers   legacy us/container   current us/container   update() us/container")
+    for count in (100, 1000, 10000):
+        samples = [build_raws(count, cycle) for cycle in range(CYCLES)]
+
+        containers = build_legacy(count)
+        previous_networks = [None] * count
+        cycles = iter(samples)
+        legacy_time = timeit.timeit(
+            lambda: run_legacy(containers, next(cycles), previous_networks), number=CYCLES)
+
+        containers, fleet = build_current(count)
+        cycles = iter(samples)
+        current_time = timeit.timeit(lambda: run_current(containers, fleet, next(cycles)), number=CYCLES)
+        update_time = timeit.timeit(fleet.update, number=CYCLES)
+
+        print("{:>10}   {:>19.2f}   {:>20.2f}   {:>21.3f}".format(
+            count,
+            legacy_time * 1e6 / CYCLES / count,
+            current_time * 1e6 / CYCLES / count,
+            update_time * 1e6 / CYCLES / count))
+
+
+if __name__ == '__main__':
+    main()
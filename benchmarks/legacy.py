@@ -0,0 +1,93 @@
+'''
+Per-container stats path of DockerContainerAPI before the ContainerStats
+record and FleetStats, kept as the baseline of the benchmarks.
+'''
+from dateutil import parser
+
+
+def get_info(container, image):
+    attrs = container.attrs
+    return {
+        'id': container.id,
+        'image': image,
+        'status': attrs['State']['Status'],
+        'created': parser.parse(attrs['Created']),
+        'started_at': parser.parse(attrs['State']['StartedAt']),
+        'finished_at': parser.parse(attrs['State']['FinishedAt']),
+        'exit_code': attrs['State']['ExitCode'],
+    }
+
+
+def get_cpu_stats(raw):
+    cpu_stats = {}
+    try:
+        if 'online_cpus' in raw['cpu_stats']:
+            cpu_count = raw['cpu_stats']['online_cpus']
+        else:
+            cpu_count = len(
+                raw['cpu_stats']['cpu_usage']['percpu_usage'] or [])
+
+        cpu_percent = 0.0
+        cpu_delta = float(raw["cpu_stats"]["cpu_usage"]["total_usage"]) - float(raw["precpu_stats"]["cpu_usage"]["total_usage"])
+        system_delta = float(raw["cpu_stats"]["system_cpu_usage"]) - float(raw["precpu_stats"]["system_cpu_usage"])
+        if system_delta > 0.0:
+            cpu_percent = cpu_delta / system_delta * 100.0 * cpu_count
+        cpu_stats['total'] = round(cpu_percent, 2)
+        cpu_stats['online_cpus'] = cpu_count
+    except KeyError:
+        pass
+    return cpu_stats
+
+
+def get_memory_stats(raw):
+    memory_stats = {}
+    try:
+        memory_stats['usage'] = raw['memory_stats']['usage']
+        memory_stats['limit'] = raw['memory_stats']['limit']
+    except (KeyError, TypeError):
+        pass
+    else:
+        memory_stats['usage_percent'] = round(
+            float(memory_stats['usage']) / float(memory_stats['limit']) * 100.0, 2)
+    return memory_stats
+
+
+def get_network_stats(raw, read_at, previous_network):
+    network_stats = {}
+    network_stats['total_tx'] = 0
+    network_stats['total_rx'] = 0
+    network_stats['speed_tx'] = 0
+    network_stats['speed_rx'] = 0
+    network_new = previous_network
+    try:
+        for if_name, data in raw["networks"].items():
+            network_stats['total_tx'] += data["tx_bytes"]
+            network_stats['total_rx'] += data["rx_bytes"]
+
+        network_new = {
+            'read': read_at,
+            'total_tx': network_stats['total_tx'],
+            'total_rx': network_stats['total_rx'],
+        }
+    except KeyError:
+        pass
+    else:
+        if previous_network:
+            tx = network_new['total_tx'] - previous_network['total_tx']
+            rx = network_new['total_rx'] - previous_network['total_rx']
+            tim = (network_new['read'] - previous_network['read']).total_seconds()
+
+            if tim > 0:
+                network_stats['speed_tx'] = round(float(tx) / tim, 2)
+                network_stats['speed_rx'] = round(float(rx) / tim, 2)
+    return network_stats, network_new
+
+
+def get_usage(raw, previous_network):
+    """Usage part of the former get_stats, returns the dicts and the new previous network."""
+    stats = {}
+    stats['read'] = parser.parse(raw['read'])
+    stats['cpu'] = get_cpu_stats(raw)
+    stats['memory'] = get_memory_stats(raw)
+    stats['network'], previous_network = get_network_stats(raw, stats['read'], previous_network)
+    return stats, previous_network
@@ -0,0 +1,112 @@
+'''
+Memory retained per monitored container
+
+Compares what the integration kept alive per container before and after
+the ContainerStats record, both fed with the sample inspect and stats
+payloads of the payloads directory:
+
+- before: the docker-py Container object with its whole inspect JSON,
+  the nested info/cpu/memory/network dicts of the last cycle and the
+  previous network sample,
+- after: a DockerContainerAPI after two get_stats cycles, with its
+  ContainerStats record and its share of the FleetStats arrays.
+
+Needs the integration requirements and Home Assistant installed.
+Run with: python benchmarks/memory_footprint.py [containers]
+'''
+import copy
+import gc
+import json
+import os
+import sys
+import tracemalloc
+
+from docker.models.containers import Container
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import legacy  # noqa: E402
+from custom_components.docker_monitor import DockerContainerAPI  # noqa: E402
+from custom_components.docker_monitor.stats import FleetStats  # noqa: E402
+
+PAYLOADS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'payloads')
+with open(os.path.join(PAYLOADS, 'container_inspect.json')) as payload:
+    INSPECT = json.load(payload)
+with open(os.path.join(PAYLOADS, 'container_stats.json')) as payload:
+    STATS = json.load(payload)
+IMAGE_TAGS = ['homeassistant/home-assistant:stable']
+
+
+class PayloadAPI:
+    """Low-level API answering with a fresh copy of the sample payloads, like the daemon."""
+
+    def __init__(self, index):
+        self._id = '{:064x}'.format(index)
+
+    def inspect_container(self, name):
+        attrs = copy.deepcopy(INSPECT)
+        attrs['Id'] = self._id
+        return attrs
+
+    def inspect_image(self, image):
+        return {'RepoTags': list(IMAGE_TAGS)}
+
+    def stats(self, container, stream):
+        return copy.deepcopy(STATS)
+
+
+class PayloadClient:
+    def __init__(self, index):
+        self.api = PayloadAPI(index)
+
+
+def build_legacy(count):
+    retained = []
+    for index in range(count):
+        api = PayloadAPI(index)
+        container = Container(attrs=api.inspect_container('homeassistant'))
+        previous_network = None
+        for cycle in range(2):
+            # reload() replaced the whole attrs with a new inspect payload
+            container.attrs = api.inspect_container('homeassistant')
+            stats, previous_network = legacy.get_usage(api.stats(container.id, False), previous_network)
+            stats['info'] = legacy.get_info(container, IMAGE_TAGS[0])
+        retained.append((container, stats, previous_network))
+    return retained
+
+
+def build_current(count):
+    containers = [DockerContainerAPI(None, PayloadClient(index), 'homeassistant') for index in range(count)]
+    fleet = FleetStats([container.stats for container in containers])
+    for cycle in range(2):
+        for container in containers:
+            container.get_stats()
+        fleet.update()
+    return containers, fleet
+
+
+def measure(build, count):
+    gc.collect()
+    tracemalloc.start()
+    retained = build(count)
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del retained
+    return size / count
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    legacy_size = measure(build_legacy, count)
+    current_size = measure(build_current, count)
+    print("Containers:                 {}".format(count))
+    print("Container + nested dicts:   {:.0f} bytes/container".format(legacy_size))
+    print("DockerContainerAPI:         {:.0f} bytes/container".format(current_size))
+    print("Saved:                      {:.0f}%".format((1 - current_size / legacy_size) * 100))
+
+
+if __name__ == '__main__':
+    main()
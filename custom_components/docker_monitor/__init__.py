@@ -2,6 +2,7 @@
 Docker Monitor component
 '''
 import logging
+import re
 import threading
 import time
 from datetime import timedelta
@@ -30,11 +31,40 @@ from custom_components.docker_monitor.const import (
     DEFAULT_URL,
     DEFAULT_SCAN_INTERVAL,
     DEFAULT_MONITORED_CONDITIONS,
-    CONF_CONTAINERS
+    DEFAULT_LOG_PATTERN,
+    DEFAULT_PROFILE_CYCLES,
+    MONITORED_CONDITIONS,
+    LOG_FOLLOW_RETRY_INTERVAL,
+    LOG_FOLLOW_STOP_TIMEOUT,
+    LOG_MAX_LINE_LENGTH,
+    CONF_CONTAINERS,
+    CONF_LOG_PATTERN,
+    CONF_TRACE_FILE,
+    SERVICE_PROFILE,
+    ATTR_CYCLES
 )
+from custom_components.docker_monitor.stats import (
+    ContainerStats,
+    READ,
+    CPU_TOTAL,
+    PRECPU_TOTAL,
+    SYSTEM_CPU,
+    PRESYSTEM_CPU,
+    ONLINE_CPUS,
+    MEMORY_USAGE,
+    MEMORY_LIMIT,
+    NETWORK_TX,
+    NETWORK_RX
+)
+from custom_components.docker_monitor.trace import TRACER, PROFILER
 
 _LOGGER = logging.getLogger(__name__)
 
+NAN = float('nan')
+
+# Fixed width RFC3339Nano in UTC as written by the daemon, compares lexicographically
+LOG_TIMESTAMP = re.compile(rb'\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d\.\d{9}Z')
+
 CONFIG_SCHEMA = vol.Schema({
     DOMAIN: vol.Schema({
         vol.Optional(CONF_NAME, default=DEFAULT_NAME):
@@ -44,12 +74,21 @@ CONFIG_SCHEMA = vol.Schema({
         vol.Optional(CONF_SCAN_INTERVAL, default=DEFAULT_SCAN_INTERVAL):
             cv.time_period,
         vol.Optional(CONF_MONITORED_CONDITIONS, default=DEFAULT_MONITORED_CONDITIONS):
-            vol.All(cv.ensure_list, [vol.In(DEFAULT_MONITORED_CONDITIONS)]),
+            vol.All(cv.ensure_list, [vol.In(MONITORED_CONDITIONS)]),
         vol.Optional(CONF_CONTAINERS):
             cv.ensure_list,
+        vol.Optional(CONF_LOG_PATTERN, default=DEFAULT_LOG_PATTERN):
+            cv.is_regex,
+        vol.Optional(CONF_TRACE_FILE):
+            cv.string,
     })
 }, extra=vol.ALLOW_EXTRA)
 
+SERVICE_PROFILE_SCHEMA = vol.Schema({
+    vol.Optional(ATTR_CYCLES, default=DEFAULT_PROFILE_CYCLES):
+        vol.All(vol.Coerce(int), vol.Range(min=1)),
+})
+
 async def async_setup(hass: HomeAssistant, config: Config):
     """Setup plateform."""
     
@@ -70,9 +109,30 @@ async def async_setup(hass: HomeAssistant, config: Config):
             CONF_NAME: config[DOMAIN][CONF_NAME],
             CONF_CONTAINERS: config[DOMAIN].get(CONF_CONTAINERS, [container.name for container in docker_api.get_containers()]),
             CONF_MONITORED_CONDITIONS: config[DOMAIN].get(CONF_MONITORED_CONDITIONS),
-            CONF_SCAN_INTERVAL: config[DOMAIN].get(CONF_SCAN_INTERVAL)
+            CONF_SCAN_INTERVAL: config[DOMAIN].get(CONF_SCAN_INTERVAL),
+            CONF_LOG_PATTERN: config[DOMAIN].get(CONF_LOG_PATTERN)
         }
 
+        if CONF_TRACE_FILE in config[DOMAIN]:
+            path = hass.config.path(config[DOMAIN][CONF_TRACE_FILE])
+            try:
+                await hass.async_add_executor_job(TRACER.start, path)
+            except OSError as e:
+                # Tracing is a diagnostic, the monitoring works without it
+                _LOGGER.error("Cannot trace polling cycles to {} ({})".format(path, e))
+
+        def stop(event):
+            docker_api.stop_log_followers()
+            TRACER.stop()
+
+        hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, stop)
+
+        async def async_profile(call):
+            path = hass.config.path("{}_{}.prof".format(DOMAIN, int(time.time())))
+            PROFILER.capture(call.data[ATTR_CYCLES], path)
+
+        hass.services.async_register(DOMAIN, SERVICE_PROFILE, async_profile, schema=SERVICE_PROFILE_SCHEMA)
+
         for component in PLATFORMS:
             load_platform(hass, component, DOMAIN, {}, config)
 
@@ -130,68 +190,104 @@ class DockerAPI:
             container = self._containers[name]
         return container
 
+    def stop_log_followers(self):
+        for container in self._containers.values():
+            container.stop_log_follower()
+
 
 class DockerContainerAPI:
     def __init__(self, hass, client, name):
         self._hass = hass
         self._name = name
         self._client = client
-        self._container = self._client.containers.get(self._name)
-        self._previous_network = None
+        self._id = self._client.api.inspect_container(self._name)['Id']
+        self._image_id = None
+        self._image = None
+        self._dates = None
+        self._stats = ContainerStats()
+        self._log_pattern = None
+        self._log_thread = None
+        self._log_stream = None
+        self._log_stop = None
+        self._log_lock = None
+        self._log_lines = 0
+        self._log_matches = 0
+        self._log_last_timestamp = None
+        self._previous_logs = None
 
     @property
     def name(self):
         return self._name
 
+    @property
+    def stats(self):
+        return self._stats
+
     def get_stats(self):
+        # Usage is derived for all containers at once by FleetStats,
+        # only the raw counters row of the container is filled here
         
         _LOGGER.debug("Get stats for container {}".format(self._name))
         
-        stats = {}
-        self._reload_container()
-        raw = self._container.stats(stream=False)
-
-        stats['info'] = self._get_info()
-
-        if stats['info']['status'] in ('running', 'paused'):
-            _LOGGER.debug("Container {} is running".format(self._name))
-            stats['read'] = parser.parse(raw['read'])
-            stats['cpu'] = self._get_cpu_stats(raw)
-            stats['memory'] = self._get_memory_stats(raw)
-            stats['network'] = self._get_network_stats(raw, stats['read'])
-        else:
-            _LOGGER.debug("Container {} is not running".format(self._name))
-            stats['cpu'] = {}
-            stats['memory'] = {}
-            stats['network'] = {}
+        with TRACER.span('get_stats', container=self._name):
+            stats = self._stats
+            self._load_info(stats)
+            self._load_log_stats(stats)
+
+            counters = stats.counters
+            if stats.status in ('running', 'paused'):
+                _LOGGER.debug("Container {} is running".format(self._name))
+                with TRACER.span('stats', container=self._name):
+                    raw = self._client.api.stats(self._id, stream=False)
+                with TRACER.span('parse_dates', container=self._name):
+                    stats.read = parser.isoparse(raw['read'])
+                counters[READ] = stats.read.timestamp()
+                self._load_cpu_counters(counters, raw)
+                self._load_memory_counters(counters, raw)
+                self._load_network_counters(counters, raw)
+            else:
+                _LOGGER.debug("Container {} is not running".format(self._name))
+                stats.read = None
+                counters[:] = NAN
             
-        _LOGGER.debug("Stats for container {} ({}): {}".format(self._name, self._container.id, stats))
+        # Formatting the counters row is costly, only when it is logged
+        if _LOGGER.isEnabledFor(logging.DEBUG):
+            _LOGGER.debug("Counters for container {} ({}): {}".format(self._name, self._id, counters))
         return stats
 
-    def _reload_container(self):
-        try:
-            self._container.reload()
-        except Exception as e:
-            self._container = self._client.containers.get(self._name)
-            self._container.reload()
-            self._previous_network = None
-
-    def _get_info(self):
+    def _load_info(self, stats):
         _LOGGER.debug("Loading info for container {}".format(self._name))
-        info = {
-            'id': self._container.id,
-            'image': self._container.image.tags[0] if len(self._container.image.tags) >= 1 else 'unknown',
-            'status': self._container.attrs['State']['Status'],
-            'created': parser.parse(self._container.attrs['Created']),
-            'started_at': parser.parse(self._container.attrs['State']['StartedAt']),
-            'finished_at': parser.parse(self._container.attrs['State']['FinishedAt']),
-            'exit_code': self._container.attrs['State']['ExitCode'],
-        }
-        return info    
-
-    def _get_cpu_stats(self, raw):
+        # Only the needed fields are kept, the inspect payload is dropped
+        with TRACER.span('reload', container=self._name):
+            attrs = self._client.api.inspect_container(self._name)
+        if attrs['Id'] != self._id:
+            # Container has been recreated
+            self._id = attrs['Id']
+            stats.reset_previous()
+
+        if attrs['Image'] != self._image_id:
+            with TRACER.span('image_tags', container=self._name):
+                tags = self._client.api.inspect_image(attrs['Image']).get('RepoTags') or []
+            # Untagged images are listed as '<none>:<none>', dropped as docker-py Image.tags did
+            tags = [tag for tag in tags if tag != '<none>:<none>']
+            self._image_id = attrs['Image']
+            self._image = tags[0] if len(tags) >= 1 else 'unknown'
+
+        stats.id = self._id
+        stats.image = self._image
+        stats.status = attrs['State']['Status']
+        # Dates only change when the container is recreated, started or stopped
+        dates = (attrs['Created'], attrs['State']['StartedAt'], attrs['State']['FinishedAt'])
+        if dates != self._dates:
+            with TRACER.span('parse_dates', container=self._name):
+                stats.created = parser.isoparse(dates[0])
+                stats.started_at = parser.isoparse(dates[1])
+                stats.finished_at = parser.isoparse(dates[2])
+            self._dates = dates
+        stats.exit_code = attrs['State']['ExitCode']
+
+    def _load_cpu_counters(self, counters, raw):
         _LOGGER.debug("Loading cpu stats for container {}".format(self._name))
-        cpu_stats = {}
         try:
             # Compatibility wih older Docker API
             if 'online_cpus' in raw['cpu_stats']:
@@ -200,68 +296,161 @@ class DockerContainerAPI:
                 cpu_count = len(
                     raw['cpu_stats']['cpu_usage']['percpu_usage'] or [])
 
-            cpu_percent = 0.0
-            cpu_delta = float(raw["cpu_stats"]["cpu_usage"]["total_usage"]) - float(raw["precpu_stats"]["cpu_usage"]["total_usage"])
-            system_delta = float(raw["cpu_stats"]["system_cpu_usage"]) - float(raw["precpu_stats"]["system_cpu_usage"])
-            if system_delta > 0.0:
-                cpu_percent = cpu_delta / system_delta * 100.0 * cpu_count
-            cpu_stats['total'] = round(cpu_percent, 2)
-            cpu_stats['online_cpus'] = cpu_count
-
+            counters[CPU_TOTAL] = raw["cpu_stats"]["cpu_usage"]["total_usage"]
+            counters[PRECPU_TOTAL] = raw["precpu_stats"]["cpu_usage"]["total_usage"]
+            counters[SYSTEM_CPU] = raw["cpu_stats"]["system_cpu_usage"]
+            counters[PRESYSTEM_CPU] = raw["precpu_stats"]["system_cpu_usage"]
+            counters[ONLINE_CPUS] = cpu_count
         except KeyError as e:
             # raw do not have CPU information
             _LOGGER.debug("Cannot grab CPU usage for container {} ({})".format(
-                self._container.id, e))
+                self._id, e))
             _LOGGER.debug(raw) 
-        return cpu_stats
+            counters[CPU_TOTAL:ONLINE_CPUS + 1] = NAN
     
-    def _get_memory_stats(self, raw):
+    def _load_memory_counters(self, counters, raw):
         _LOGGER.debug("Loading memory stats for container {}".format(self._name))
-        memory_stats = {}
         try:
-            memory_stats['usage'] = raw['memory_stats']['usage']
-            memory_stats['limit'] = raw['memory_stats']['limit']
+            usage = raw['memory_stats']['usage']
+            limit = raw['memory_stats']['limit']
         except (KeyError, TypeError) as e:
             # raw_stats do not have MEM information
             _LOGGER.debug("Cannot grab MEM usage for container {} ({})".format(
-                self._container.id, e))
+                self._id, e))
             _LOGGER.debug(raw)
-        else:
-            memory_stats['usage_percent'] = round(
-                float(memory_stats['usage']) / float(memory_stats['limit']) * 100.0, 2)
-        return memory_stats
+            usage = limit = NAN
+        counters[MEMORY_USAGE] = usage
+        counters[MEMORY_LIMIT] = limit
 
-    def _get_network_stats(self, raw, read_at):
+    def _load_network_counters(self, counters, raw):
         _LOGGER.debug("Loading network stats for container {}".format(self._name))
-        network_stats = {}
-        network_stats['total_tx'] = 0
-        network_stats['total_rx'] = 0
-        network_stats['speed_tx'] = 0
-        network_stats['speed_rx'] = 0
         try:
+            total_tx = 0
+            total_rx = 0
             for if_name, data in raw["networks"].items():
-                network_stats['total_tx'] += data["tx_bytes"]
-                network_stats['total_rx'] += data["rx_bytes"]
-
-            network_new = {
-                'read': read_at,
-                'total_tx': network_stats['total_tx'],
-                'total_rx': network_stats['total_rx'],
-            }
+                total_tx += data["tx_bytes"]
+                total_rx += data["rx_bytes"]
         except KeyError as e:
             # raw_stats do not have NETWORK information
             _LOGGER.debug("Cannot grab NET usage for container {} ({})".format(
-                self._container.id, e))
+                self._id, e))
             _LOGGER.debug(raw)
-        else:
-            if self._previous_network:
-                tx = network_new['total_tx'] - self._previous_network['total_tx']
-                rx = network_new['total_rx'] - self._previous_network['total_rx']
-                tim = (network_new['read'] - self._previous_network['read']).total_seconds()
-
-                if tim > 0:
-                    network_stats['speed_tx'] = round(float(tx) / tim, 2)
-                    network_stats['speed_rx'] = round(float(rx) / tim, 2)
-
-            self._previous_network = network_new
-        return network_stats
+            total_tx = total_rx = NAN
+        counters[NETWORK_TX] = total_tx
+        counters[NETWORK_RX] = total_rx
+
+    def _load_log_stats(self, stats):
+        _LOGGER.debug("Loading log stats for container {}".format(self._name))
+        if self._log_thread is None:
+            return
+
+        with self._log_lock:
+            lines = self._log_lines
+            matches = self._log_matches
+        read = time.monotonic()
+        stats.log_pattern = self._log_pattern.pattern
+        stats.log_lines_rate = 0
+        stats.log_matches_rate = 0
+        if self._previous_logs:
+            previous_read, previous_lines, previous_matches = self._previous_logs
+            tim = read - previous_read
+            if tim > 0:
+                stats.log_lines_rate = round((lines - previous_lines) / tim, 2)
+                stats.log_matches_rate = round((matches - previous_matches) / tim, 2)
+
+        self._previous_logs = (read, lines, matches)
+
+    def start_log_follower(self, pattern):
+        if self._log_thread is not None:
+            return
+        _LOGGER.debug("Start log follower for container {}".format(self._name))
+        self._log_pattern = pattern
+        # Only containers following their logs pay for the synchronization
+        self._log_stop = threading.Event()
+        self._log_lock = threading.Lock()
+        self._log_thread = threading.Thread(
+            target=self._follow_logs,
+            name="docker_monitor_logs_{}".format(self._name),
+            daemon=True
+        )
+        self._log_thread.start()
+
+    def stop_log_follower(self):
+        if self._log_thread is None:
+            return
+        _LOGGER.debug("Stop log follower for container {}".format(self._name))
+        self._log_stop.set()
+        # Closing the stream unblocks the thread waiting for the next chunk
+        self._close_log_stream()
+        self._log_thread.join(LOG_FOLLOW_STOP_TIMEOUT)
+        if self._log_thread.is_alive():
+            _LOGGER.warning("Log follower for container {} did not stop".format(self._name))
+            return
+        self._log_thread = None
+
+    def _close_log_stream(self):
+        stream = self._log_stream
+        if stream is None:
+            return
+        try:
+            stream.close()
+        except Exception as e:
+            _LOGGER.debug("Cannot close log stream for container {} ({})".format(self._name, e))
+
+    def _follow_logs(self):
+        # Only count lines written from now on, never the log history
+        since = int(time.time())
+        while not self._log_stop.is_set():
+            # Lines replayed by 'since' (second granularity) up to the last one
+            # seen were already counted, later ones may arrive out of order
+            cutoff = self._log_last_timestamp
+            try:
+                self._log_stream = self._client.api.logs(
+                    self._name, stream=True, follow=True, timestamps=True, since=since)
+                # Stop may have been requested before the stream was published
+                if self._log_stop.is_set():
+                    self._close_log_stream()
+                self._consume_logs(self._log_stream, cutoff)
+            except Exception as e:
+                _LOGGER.debug("Cannot follow logs for container {} ({})".format(self._name, e))
+            finally:
+                self._log_stream = None
+
+            # Resume from the last line seen, stream ends when the container stops
+            if self._log_last_timestamp is not None:
+                try:
+                    since = int(parser.isoparse(self._log_last_timestamp.decode('ascii')).timestamp())
+                except ValueError as e:
+                    _LOGGER.debug("Invalid log timestamp for container {} ({})".format(self._name, e))
+            self._log_stop.wait(LOG_FOLLOW_RETRY_INTERVAL)
+
+    def _consume_logs(self, stream, cutoff):
+        pending = b''
+        for chunk in stream:
+            if self._log_stop.is_set():
+                break
+            lines = (pending + chunk).split(b'\n')
+            # Keep the incomplete last line, truncated so a line without
+            # newline can not grow the buffer indefinitely
+            pending = lines.pop()[:LOG_MAX_LINE_LENGTH]
+
+            count = 0
+            matches = 0
+            for line in lines:
+                timestamp, _, message = line.partition(b' ')
+                if LOG_TIMESTAMP.fullmatch(timestamp):
+                    if cutoff is not None and timestamp <= cutoff:
+                        continue
+                    if self._log_last_timestamp is None or timestamp > self._log_last_timestamp:
+                        self._log_last_timestamp = timestamp
+                else:
+                    # Not a timestamped line, e.g. the rest of a truncated one
+                    message = line
+                count += 1
+                if self._log_pattern.search(message.decode('utf-8', 'replace')):
+                    matches += 1
+
+            if count:
+                with self._log_lock:
+                    self._log_lines += count
+                    self._log_matches += matches
@@ -6,7 +6,7 @@ NAME = "Docker Monitor"
 DOMAIN = "docker_monitor"
 DOMAIN_DATA = f"{DOMAIN}_data"
 VERSION = "0.0.5"
-REQUIREMENTS = ['docker==3.7.0', 'python-dateutil==2.7.5']
+REQUIREMENTS = ['docker==3.7.0', 'python-dateutil==2.7.5', 'numpy>=1.21']
 
 ISSUE_URL = "https://github.com/guillaumelamirand/docker-monitor/issues"
 
@@ -21,11 +21,33 @@ DATA_CONFIG = 'config'
 
 # Configuration and options
 CONF_CONTAINERS = 'containers'
+CONF_LOG_PATTERN = 'log_pattern'
+CONF_TRACE_FILE = 'trace_file'
+
+# Services
+SERVICE_PROFILE = 'profile'
+ATTR_CYCLES = 'cycles'
 
 # Defaults
 DEFAULT_NAME = DOMAIN
 DEFAULT_URL = 'unix://var/run/docker.sock'
 DEFAULT_SCAN_INTERVAL = timedelta(seconds=10)
+DEFAULT_LOG_PATTERN = '(?i)error'
+
+# Containers polling
+CONTAINER_FETCH_TIMEOUT = 10
+CONTAINER_MAX_CONCURRENT_FETCHES = 16
+
+# Log follower
+LOG_FOLLOW_RETRY_INTERVAL = 10
+LOG_FOLLOW_STOP_TIMEOUT = 5
+LOG_MAX_LINE_LENGTH = 16 * 1024
+
+# Tracing
+TRACE_BATCH_SIZE = 1000
+TRACE_MAX_PENDING_BATCHES = 10
+TRACE_STOP_TIMEOUT = 5
+DEFAULT_PROFILE_CYCLES = 5
 
 DOCKER_MONITOR_VERSION = 'docker_version'
 
@@ -43,6 +65,8 @@ CONTAINER_MONITOR_NETWORK_SPEED_UP = 'container_network_speed_up'
 CONTAINER_MONITOR_NETWORK_SPEED_DOWN = 'container_network_speed_down'
 CONTAINER_MONITOR_NETWORK_TOTAL_UP = 'container_network_total_up'
 CONTAINER_MONITOR_NETWORK_TOTAL_DOWN = 'container_network_total_down'
+CONTAINER_MONITOR_LOG_LINES = 'container_log_lines_rate'
+CONTAINER_MONITOR_LOG_MATCHES = 'container_log_matches_rate'
 CONTAINER_MONITORED_CONDITIONS = {
     CONTAINER_MONITOR_STATUS: ['Status', None, 'mdi:checkbox-marked-circle-outline', None, None],
     CONTAINER_MONITOR_UPTIME: ['Up Time', 'minutes', 'mdi:clock', 'timestamp', None],
@@ -54,12 +78,25 @@ CONTAINER_MONITORED_CONDITIONS = {
     CONTAINER_MONITOR_NETWORK_SPEED_DOWN: ['Network speed Down', 'kB/s', 'mdi:download', None, 'measurement'],
     CONTAINER_MONITOR_NETWORK_TOTAL_UP: ['Network total Up', 'MB', 'mdi:upload', None, 'total_increasing'],
     CONTAINER_MONITOR_NETWORK_TOTAL_DOWN: ['Network total Down', 'MB', 'mdi:download', None, 'total_increasing'],
+    CONTAINER_MONITOR_LOG_LINES: ['Log lines', 'lines/s', 'mdi:text-box-outline', None, 'measurement'],
+    CONTAINER_MONITOR_LOG_MATCHES: ['Log matches', 'matches/s', 'mdi:text-box-search-outline', None, 'measurement'],
 }
 
-DEFAULT_MONITORED_CONDITIONS = \
+# Log conditions need a follower thread per container, so they are opt-in
+CONTAINER_LOG_MONITORED_CONDITIONS = [
+    CONTAINER_MONITOR_LOG_LINES,
+    CONTAINER_MONITOR_LOG_MATCHES,
+]
+
+MONITORED_CONDITIONS = \
     list(DOCKER_MONITORED_CONDITIONS.keys()) + \
     list(CONTAINER_MONITORED_CONDITIONS.keys())
 
+DEFAULT_MONITORED_CONDITIONS = [
+    monitor_condition for monitor_condition in MONITORED_CONDITIONS
+    if monitor_condition not in CONTAINER_LOG_MONITORED_CONDITIONS
+]
+
 STARTUP_MESSAGE = f"""
 -------------------------------------------------------------------
 {NAME}
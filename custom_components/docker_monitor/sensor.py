@@ -2,6 +2,7 @@
 Docker Monitor component
 '''
 from datetime import timedelta
+import asyncio
 import logging
 import async_timeout
 
@@ -13,6 +14,7 @@ from homeassistant.const import (
     CONF_SCAN_INTERVAL,
     EVENT_HOMEASSISTANT_STOP
 )
+from homeassistant.core import callback
 from homeassistant.helpers.entity import ( 
     Entity, 
     generate_entity_id
@@ -27,11 +29,17 @@ from custom_components.docker_monitor.const import (
     DATA_DOCKER_API,
     DATA_CONFIG,
     CONF_CONTAINERS,
+    CONF_LOG_PATTERN,
+    CONTAINER_FETCH_TIMEOUT,
+    CONTAINER_MAX_CONCURRENT_FETCHES,
     DOCKER_MONITORED_CONDITIONS,
     DOCKER_MONITOR_VERSION,
     CONTAINER_MONITORED_CONDITIONS,
+    CONTAINER_LOG_MONITORED_CONDITIONS,
     CONTAINER_MONITOR_CPU_PERCENTAGE,
     CONTAINER_MONITOR_IMAGE,
+    CONTAINER_MONITOR_LOG_LINES,
+    CONTAINER_MONITOR_LOG_MATCHES,
     CONTAINER_MONITOR_MEMORY_PERCENTAGE,
     CONTAINER_MONITOR_MEMORY_USAGE,
     CONTAINER_MONITOR_NETWORK_SPEED_DOWN,
@@ -41,6 +49,8 @@ from custom_components.docker_monitor.const import (
     CONTAINER_MONITOR_STATUS,
     CONTAINER_MONITOR_UPTIME
 )
+from custom_components.docker_monitor.stats import FleetStats
+from custom_components.docker_monitor.trace import TRACER, PROFILER
 
 VERSION = '0.0.4'
 DEPENDENCIES = ['docker_monitor']
@@ -54,6 +64,7 @@ ATTR_ONLINE_CPUS = 'online_cpus'
 ATTR_STARTED_AT = 'started_at'
 ATTR_FINISHED_AT = 'finished_at'
 ATTR_EXIT_CODE = 'exit_code'
+ATTR_LOG_PATTERN = 'pattern'
 ATTR_VERSION_API_VERSION = 'api_version'
 ATTR_VERSION_ARCH = 'arch'
 ATTR_VERSION_OS = 'os'
@@ -80,32 +91,40 @@ async def async_setup_platform(hass, config, async_add_entities, discovery_info=
     )
     await docker_coordinator.async_refresh()
 
+    follow_logs = any(monitor_condition in CONTAINER_LOG_MONITORED_CONDITIONS
+                      for monitor_condition in config[CONF_MONITORED_CONDITIONS])
+
     sensors = [DockerSensor(docker_coordinator, platform_name, monitor_condition)
                for monitor_condition in config[CONF_MONITORED_CONDITIONS] if monitor_condition in DOCKER_MONITORED_CONDITIONS]
 
     ####
     ## Initialiaze containers sensors
     ####
+    containers = []
     for container_name in config[CONF_CONTAINERS]:
         container = docker_api.get_container(container_name)
         if container:
             _LOGGER.debug("Initialize sensors for container '{}'".format(container_name))
-            container_coordinator = DockerContainerDataUpdateCoordinator(
-                hass,
-                _LOGGER,
-                container=container,
-                update_interval=timedelta(seconds=interval),
-            )
-
-            # Fetch initial data so we have data when entities subscribe
-            await container_coordinator.async_refresh()
-
-            sensors += [DockerContainerSensor(container_coordinator, platform_name, container_name, monitor_condition)
-                         for monitor_condition in config[CONF_MONITORED_CONDITIONS] if monitor_condition in CONTAINER_MONITORED_CONDITIONS]
+            if follow_logs:
+                container.start_log_follower(config[CONF_LOG_PATTERN])
+            containers.append(container)
         else:
             _LOGGER.error("Container '{}' not found".format(container_name))
 
+    # All containers are polled together so their usage is computed in one batch
+    containers_coordinator = DockerContainersDataUpdateCoordinator(
+        hass,
+        _LOGGER,
+        containers=containers,
+        update_interval=timedelta(seconds=interval),
+    )
+
+    # Fetch initial data so we have data when entities subscribe
+    await containers_coordinator.async_refresh()
 
+    for container in containers:
+        sensors += [DockerContainerSensor(containers_coordinator, platform_name, container.name, monitor_condition)
+                     for monitor_condition in config[CONF_MONITORED_CONDITIONS] if monitor_condition in CONTAINER_MONITORED_CONDITIONS]
    
     async_add_entities(sensors)
     return True
@@ -216,29 +235,93 @@ class DockerSensor(Entity):
         """Return the unit the value is expressed in."""
         return self._monitor_condition_unit
 
-class DockerContainerDataUpdateCoordinator(DataUpdateCoordinator):
-    """Manages polling for state changes from the container."""
+class DockerContainersDataUpdateCoordinator(DataUpdateCoordinator):
+    """Manages polling for state changes from the containers."""
 
-    def __init__(self, hass, logger, update_interval, container):
+    def __init__(self, hass, logger, update_interval, containers):
         """Initialize the data update coordinator."""
         DataUpdateCoordinator.__init__(
             self,
             hass,
             logger,
-            name="container stats for '{}'".format(container.name),
+            name="containers stats",
             update_interval=update_interval,
             update_method=self.async_update_data
         )
-        self._container = container
+        self._containers = containers
+        self._fleet = FleetStats([container.stats for container in containers])
+        # Bounds the executor threads used by one refresh
+        self._semaphore = asyncio.Semaphore(CONTAINER_MAX_CONCURRENT_FETCHES)
+        # Containers whose fetch is still running, possibly after a timeout
+        self._fetching = set()
+        # Containers whose last fetch failed, warned once until they recover
+        self._failed = set()
     
     async def async_update_data(self):
-        """Fetch data from Container API endpoint.
+        """Fetch data from Container API endpoints.
+
+        Data maps container names to their stats, a container whose fetch
+        failed or timed out is left out so only its sensors become unavailable.
         """
+        profiling = PROFILER.start_cycle()
         try:
-            async with async_timeout.timeout(10):
-                return await self.hass.async_add_executor_job(self._container.get_stats)
+            with TRACER.span('coordinator_update', containers=len(self._containers)):
+                # Profiled cycles are slower, they are not subject to the timeout
+                timeout = None if profiling else CONTAINER_FETCH_TIMEOUT
+                results = await asyncio.gather(
+                    *[self._async_get_stats(container, timeout) for container in self._containers],
+                    return_exceptions=True
+                )
+                data = {}
+                for index, (container, result) in enumerate(zip(self._containers, results)):
+                    if isinstance(result, Exception):
+                        if container.name in self._failed:
+                            _LOGGER.debug("Error communicating with Docker API for container '{}': {}".format(
+                                container.name, result))
+                        else:
+                            _LOGGER.warning("Error communicating with Docker API for container '{}': {}".format(
+                                container.name, result))
+                            self._failed.add(container.name)
+                        self._fleet.clear(index)
+                    else:
+                        if container.name in self._failed:
+                            _LOGGER.info("Container '{}' is reachable again".format(container.name))
+                            self._failed.discard(container.name)
+                        data[container.name] = result
+                await self.hass.async_add_executor_job(self._update_fleet)
         except Exception as exception:
             raise UpdateFailed(f"Error communicating with Docker API: {exception}")
+        finally:
+            # Listeners write the entity states right after this method returns
+            if profiling:
+                self.hass.loop.call_soon(self._stop_profile_cycle)
+            self.hass.loop.call_soon(TRACER.flush)
+
+        if self._containers and not data:
+            raise UpdateFailed("Error communicating with Docker API: {}".format(results[-1]))
+        return data
+
+    async def _async_get_stats(self, container, timeout):
+        if container.name in self._fetching:
+            raise UpdateFailed("Previous fetch for container '{}' is still running".format(container.name))
+
+        async with self._semaphore:
+            self._fetching.add(container.name)
+            job = self.hass.async_add_executor_job(container.get_stats)
+            job.add_done_callback(lambda _: self._fetching.discard(container.name))
+            try:
+                # Shielded, a timed out job keeps running and stays in _fetching
+                return await asyncio.wait_for(asyncio.shield(job), timeout)
+            except asyncio.TimeoutError:
+                raise UpdateFailed("Timeout fetching container '{}'".format(container.name))
+
+    def _stop_profile_cycle(self):
+        if PROFILER.stop_cycle():
+            self.hass.async_add_executor_job(PROFILER.dump)
+
+    def _update_fleet(self):
+        with TRACER.span('fleet_update', containers=len(self._containers)):
+            self._fleet.update()
 
 class DockerContainerSensor(Entity):
     """Representation of a Docker Sensor."""
@@ -264,10 +347,16 @@ class DockerContainerSensor(Entity):
 
         self.async_on_remove(
             self._coordinator.async_add_listener(
-                self.async_write_ha_state
+                self._handle_coordinator_update
             )
         )
 
+    @callback
+    def _handle_coordinator_update(self):
+        """Write the new state, traced as part of the polling cycle."""
+        with TRACER.span('write_state', container=self._container_name, condition=self._monitor_condition_id):
+            self.async_write_ha_state()
+
     async def async_update(self):
         """Update the entity.
 
@@ -280,45 +369,49 @@ class DockerContainerSensor(Entity):
     def state(self):
         """Return the state of the sensor."""
         # Fetch new data from coordinator
-        stats = self._coordinator.data
+        stats = self._coordinator.data[self._container_name]
         state = None
         # Info
         if self._monitor_condition_id == CONTAINER_MONITOR_STATUS:
-            state = stats['info']['status']
+            state = stats.status
         elif self._monitor_condition_id == CONTAINER_MONITOR_UPTIME:
-            if stats['info']['status'] in ('running', 'paused'):
-                started_at = stats.get('info', {}).get('started_at')
-                delta = (dt_util.now() - started_at).total_seconds() / 60
+            if stats.status in ('running', 'paused'):
+                delta = (dt_util.now() - stats.started_at).total_seconds() / 60
                 state = round(delta, 2)
         elif self._monitor_condition_id == CONTAINER_MONITOR_IMAGE:
-            state = stats['info']['image'][0]  # get first from array
+            state = stats.image
         # cpu
         elif self._monitor_condition_id == CONTAINER_MONITOR_CPU_PERCENTAGE:
-            state = stats.get('cpu', {}).get('total')
+            state = stats.cpu_percent
         # memory
         elif self._monitor_condition_id == CONTAINER_MONITOR_MEMORY_USAGE:
-            use = stats.get('memory', {}).get('usage')
+            use = stats.memory_usage
             if use is not None:
                 state = round(use / (1024 ** 2), 2)  # Bytes to MiB
         elif self._monitor_condition_id == CONTAINER_MONITOR_MEMORY_PERCENTAGE:
-            state = stats.get('memory', {}).get('usage_percent')
+            state = stats.memory_usage_percent
         # network
         elif self._monitor_condition_id == CONTAINER_MONITOR_NETWORK_SPEED_UP:
-            up = stats.get('network', {}).get('speed_tx')
+            up = stats.network_speed_tx
             if up is not None:
                 state = round(up / (1024), 2)  # Bytes to kB
         elif self._monitor_condition_id == CONTAINER_MONITOR_NETWORK_SPEED_DOWN:
-            down = stats.get('network', {}).get('speed_rx')
+            down = stats.network_speed_rx
             if down is not None:
                 state = round(down / (1024), 2)
         elif self._monitor_condition_id == CONTAINER_MONITOR_NETWORK_TOTAL_UP:
-            up = stats.get('network', {}).get('total_tx') # Bytes to kB
+            up = stats.network_total_tx # Bytes to kB
             if up is not None:
                 state = round(up / (1024 ** 2), 2)
         elif self._monitor_condition_id == CONTAINER_MONITOR_NETWORK_TOTAL_DOWN:
-            down = stats.get('network', {}).get('total_rx')
+            down = stats.network_total_rx
             if down is not None:
                 state = round(down / (1024 ** 2), 2)  
+        # logs
+        elif self._monitor_condition_id == CONTAINER_MONITOR_LOG_LINES:
+            state = stats.log_lines_rate
+        elif self._monitor_condition_id == CONTAINER_MONITOR_LOG_MATCHES:
+            state = stats.log_matches_rate
                 
         self._state = state
         return self._state
@@ -327,24 +420,28 @@ class DockerContainerSensor(Entity):
     def state_attributes(self):
         """Return the state attributes."""
         # Fetch new data from coordinator
-        stats = self._coordinator.data
+        stats = self._coordinator.data[self._container_name]
         attributes = {}
         if self._monitor_condition_id in (CONTAINER_MONITOR_STATUS):
-            attributes[ATTR_IMAGE] = stats['info']['image']
-            attributes[ATTR_CREATED] = dt_util.as_local(stats['info']['created']).isoformat()
-            if stats['info']['status'] in ('running', 'paused'):
-                attributes[ATTR_STARTED_AT] = dt_util.as_local(stats['info']['started_at']).isoformat()
+            attributes[ATTR_IMAGE] = stats.image
+            attributes[ATTR_CREATED] = dt_util.as_local(stats.created).isoformat()
+            if stats.status in ('running', 'paused'):
+                attributes[ATTR_STARTED_AT] = dt_util.as_local(stats.started_at).isoformat()
             else:
-                attributes[ATTR_FINISHED_AT] = dt_util.as_local(stats['info']['finished_at']).isoformat()
-                attributes[ATTR_EXIT_CODE] = stats['info']['exit_code']
+                attributes[ATTR_FINISHED_AT] = dt_util.as_local(stats.finished_at).isoformat()
+                attributes[ATTR_EXIT_CODE] = stats.exit_code
         elif self._monitor_condition_id in (CONTAINER_MONITOR_CPU_PERCENTAGE):
-            online_cpus = stats.get('cpu', {}).get('online_cpus')
+            online_cpus = stats.online_cpus
             if online_cpus is not None:
                 attributes[ATTR_ONLINE_CPUS] = online_cpus
         elif self._monitor_condition_id in (CONTAINER_MONITOR_MEMORY_USAGE, CONTAINER_MONITOR_MEMORY_PERCENTAGE):
-            limit = stats.get('memory', {}).get('limit')
+            limit = stats.memory_limit
             if limit is not None:
                 attributes[ATTR_MEMORY_LIMIT] = str(round(limit / (1024 ** 2), 2)) + ' MiB'
+        elif self._monitor_condition_id == CONTAINER_MONITOR_LOG_MATCHES:
+            pattern = stats.log_pattern
+            if pattern is not None:
+                attributes[ATTR_LOG_PATTERN] = pattern
         return attributes
 
     @property
@@ -355,7 +452,7 @@ class DockerContainerSensor(Entity):
     @property
     def available(self):
         """Return if entity is available."""
-        return self._coordinator.last_update_success
+        return self._coordinator.last_update_success and self._container_name in self._coordinator.data
 
     @property
     def name(self):
@@ -0,0 +1,194 @@
+'''
+Docker Monitor container snapshot
+'''
+import math
+
+import numpy as np
+
+# Raw counters of a running container, in column order
+COUNTERS = (
+    'read',
+    'cpu_total',
+    'precpu_total',
+    'system_cpu',
+    'presystem_cpu',
+    'online_cpus',
+    'memory_usage',
+    'memory_limit',
+    'network_tx',
+    'network_rx',
+)
+(
+    READ,
+    CPU_TOTAL,
+    PRECPU_TOTAL,
+    SYSTEM_CPU,
+    PRESYSTEM_CPU,
+    ONLINE_CPUS,
+    MEMORY_USAGE,
+    MEMORY_LIMIT,
+    NETWORK_TX,
+    NETWORK_RX,
+) = range(len(COUNTERS))
+
+
+class ContainerStats:
+    """Fields of a container used by the sensors, updated in place every cycle.
+
+    Usage values are read from the FleetStats arrays the record is bound to.
+    """
+
+    __slots__ = (
+        # info
+        'id',
+        'image',
+        'status',
+        'created',
+        'started_at',
+        'finished_at',
+        'exit_code',
+        'read',
+        # logs
+        'log_pattern',
+        'log_lines_rate',
+        'log_matches_rate',
+        # usage
+        '_fleet',
+        '_index',
+    )
+
+    FIELDS = __slots__[:__slots__.index('_fleet')] + (
+        'cpu_percent',
+        'online_cpus',
+        'memory_usage',
+        'memory_limit',
+        'memory_usage_percent',
+        'network_total_tx',
+        'network_total_rx',
+        'network_speed_tx',
+        'network_speed_rx',
+    )
+
+    def __init__(self):
+        for slot in self.__slots__:
+            setattr(self, slot, None)
+
+    def bind(self, fleet, index):
+        self._fleet = fleet
+        self._index = index
+
+    @property
+    def counters(self):
+        """Row of the fleet counters filled for this container."""
+        return self._fleet.samples[self._index]
+
+    def reset_previous(self):
+        self._fleet.reset(self._index)
+
+    @property
+    def cpu_percent(self):
+        return _value(self._fleet.cpu_percent[self._index])
+
+    @property
+    def online_cpus(self):
+        return _value(self._fleet.samples[self._index, ONLINE_CPUS], int)
+
+    @property
+    def memory_usage(self):
+        return _value(self._fleet.samples[self._index, MEMORY_USAGE], int)
+
+    @property
+    def memory_limit(self):
+        return _value(self._fleet.samples[self._index, MEMORY_LIMIT], int)
+
+    @property
+    def memory_usage_percent(self):
+        return _value(self._fleet.memory_percent[self._index])
+
+    @property
+    def network_total_tx(self):
+        return _value(self._fleet.total_tx[self._index], int)
+
+    @property
+    def network_total_rx(self):
+        return _value(self._fleet.total_rx[self._index], int)
+
+    @property
+    def network_speed_tx(self):
+        return _value(self._fleet.speed_tx[self._index])
+
+    @property
+    def network_speed_rx(self):
+        return _value(self._fleet.speed_rx[self._index])
+
+    def __repr__(self):
+        return "ContainerStats({})".format(
+            ", ".join("{}={!r}".format(field, getattr(self, field)) for field in self.FIELDS))
+
+
+class FleetStats:
+    """Derives the usage of all containers from their raw counters in one batch.
+
+    Each bound record owns one row of samples, filled in place by
+    DockerContainerAPI.get_stats. A row of NaN is a container without usage.
+    """
+
+    def __init__(self, records):
+        count = len(records)
+        self.samples = np.full((count, len(COUNTERS)), np.nan)
+        self.cpu_percent = np.full(count, np.nan)
+        self.memory_percent = np.full(count, np.nan)
+        self.total_tx = np.full(count, np.nan)
+        self.total_rx = np.full(count, np.nan)
+        self.speed_tx = np.full(count, np.nan)
+        self.speed_rx = np.full(count, np.nan)
+        self._previous_read = np.full(count, np.nan)
+        self._previous_tx = np.zeros(count)
+        self._previous_rx = np.zeros(count)
+        for index, record in enumerate(records):
+            record.bind(self, index)
+
+    def clear(self, index):
+        self.samples[index] = np.nan
+
+    def reset(self, index):
+        # New or recreated container, previous sample is meaningless
+        self._previous_read[index] = np.nan
+
+    def update(self):
+        if not len(self.samples):
+            return
+
+        read, cpu, precpu, system, presystem, cpus, usage, limit, tx, rx = self.samples.T
+        with np.errstate(divide='ignore', invalid='ignore'):
+            running = ~np.isnan(read)
+
+            system_delta = system - presystem
+            cpu_delta = cpu - precpu
+            cpu_percent = np.where(system_delta > 0.0, cpu_delta / system_delta * 100.0 * cpus, 0.0)
+            cpu_percent[np.isnan(cpu_delta + system_delta + cpus)] = np.nan
+            np.round(cpu_percent, 2, out=self.cpu_percent)
+
+            np.round(usage / limit * 100.0, 2, out=self.memory_percent)
+
+            # Missing network counters of a running container count as 0
+            network = ~np.isnan(tx + rx)
+            np.copyto(self.total_tx, np.where(network, tx, 0.0))
+            np.copyto(self.total_rx, np.where(network, rx, 0.0))
+            tim = read - self._previous_read
+            elapsed = network & (tim > 0)
+            np.round(np.where(elapsed, (tx - self._previous_tx) / tim, 0.0), 2, out=self.speed_tx)
+            np.round(np.where(elapsed, (rx - self._previous_rx) / tim, 0.0), 2, out=self.speed_rx)
+            for column in (self.total_tx, self.total_rx, self.speed_tx, self.speed_rx):
+                column[~running] = np.nan
+
+        np.copyto(self._previous_read, read, where=network)
+        np.copyto(self._previous_tx, tx, where=network)
+        np.copyto(self._previous_rx, rx, where=network)
+
+
+def _value(value, cast=float):
+    """Return a computed value, None when it is missing or undefined."""
+    if not math.isfinite(value):
+        return None
+    return cast(value)
@@ -0,0 +1,192 @@
+'''
+Docker Monitor polling cycle tracing and profiling
+'''
+import cProfile
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+from custom_components.docker_monitor.const import (
+    TRACE_BATCH_SIZE,
+    TRACE_MAX_PENDING_BATCHES,
+    TRACE_STOP_TIMEOUT
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+# Returned by Tracer.span when tracing is disabled, nothing to set up per span
+NO_SPAN = nullcontext()
+
+
+class Tracer:
+    """Records spans of the polling cycles, written in batches as a Chrome trace.
+
+    A batch is handed to the writer thread when it is full and at the end
+    of every cycle, so recording a span never waits for the disk.
+    """
+
+    def __init__(self):
+        self._path = None
+        self._events = []
+        self._dropped = 0
+        self._lock = threading.Lock()
+        self._batches = None
+        self._writer = None
+        self._pid = os.getpid()
+
+    def start(self, path):
+        _LOGGER.info("Tracing polling cycles to {}".format(path))
+        # Chrome trace array format, the closing bracket is optional
+        with open(path, 'w') as trace_file:
+            trace_file.write('[\n')
+        # Only bounds the batches waiting for a slow disk, not the spans of a cycle
+        self._batches = queue.Queue(TRACE_MAX_PENDING_BATCHES)
+        self._writer = threading.Thread(target=self._write_batches, args=(path, self._batches),
+                                        name="docker_monitor_trace", daemon=True)
+        self._writer.start()
+        self._path = path
+
+    def stop(self):
+        if self._path is None:
+            return
+        self.flush()
+        self._path = None
+        self._batches.put(None)
+        self._writer.join(TRACE_STOP_TIMEOUT)
+        self._writer = None
+
+    def span(self, name, **args):
+        if self._path is None:
+            return NO_SPAN
+        return self._span(name, args)
+
+    @contextmanager
+    def _span(self, name, args):
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            end = time.perf_counter_ns()
+            event = {
+                'name': name,
+                'cat': 'docker_monitor',
+                'ph': 'X',
+                'ts': start / 1000,
+                'dur': (end - start) / 1000,
+                'pid': self._pid,
+                'tid': threading.get_ident(),
+                'args': args,
+            }
+            with self._lock:
+                self._events.append(event)
+                full = len(self._events) >= TRACE_BATCH_SIZE
+            if full:
+                self.flush()
+
+    def flush(self):
+        """Hand the spans recorded so far to the writer, safe from the event loop."""
+        with self._lock:
+            events, self._events = self._events, []
+        if not events or self._path is None:
+            return
+        try:
+            self._batches.put_nowait(events)
+        except queue.Full:
+            with self._lock:
+                self._dropped += len(events)
+
+    def _write_batches(self, path, batches):
+        while True:
+            events = batches.get()
+            if events is None:
+                return
+            with self._lock:
+                dropped, self._dropped = self._dropped, 0
+            if dropped:
+                _LOGGER.warning("Dropped {} trace spans, the trace file is written too slowly".format(dropped))
+            try:
+                with open(path, 'a') as trace_file:
+                    trace_file.write(''.join(json.dumps(event) + ',\n' for event in events))
+            except OSError as e:
+                _LOGGER.error("Cannot write trace to {} ({})".format(path, e))
+
+
+class CycleProfiler:
+    """Captures a cProfile of the next polling cycles.
+
+    Each cycle is profiled from its start to the entity state writes. From
+    Python 3.12 the profile covers every thread, so the executor jobs of the
+    cycle are included, as is any other work running meanwhile.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._profile = None
+        self._remaining = 0
+        self._in_cycle = False
+        self._path = None
+
+    @property
+    def active(self):
+        return self._remaining > 0
+
+    def capture(self, cycles, path):
+        if cycles < 1:
+            # The capture would never complete and block the next ones
+            _LOGGER.error("Cannot profile {} polling cycles, at least one is needed".format(cycles))
+            return
+        with self._lock:
+            if self._profile is not None:
+                _LOGGER.warning("A profile is already being captured to {}".format(self._path))
+                return
+            if sys.version_info < (3, 12):
+                _LOGGER.warning("Python < 3.12 only profiles the event loop thread, not the executor jobs")
+            _LOGGER.info("Profiling {} polling cycles to {}".format(cycles, path))
+            self._profile = cProfile.Profile()
+            self._path = path
+            self._remaining = cycles
+
+    def start_cycle(self):
+        """Enable the profile for one cycle, False if not capturing or a cycle is in progress."""
+        with self._lock:
+            if self._remaining == 0 or self._in_cycle:
+                return False
+            try:
+                self._profile.enable()
+            except ValueError as e:
+                # Another profiler is running, e.g. the profiler integration
+                _LOGGER.error("Cannot profile polling cycles ({})".format(e))
+                self._profile = None
+                self._remaining = 0
+                return False
+            self._in_cycle = True
+        return True
+
+    def stop_cycle(self):
+        """Disable the profile, True when the capture is complete and must be dumped."""
+        with self._lock:
+            self._profile.disable()
+            self._in_cycle = False
+            self._remaining -= 1
+            return self._remaining == 0
+
+    def dump(self):
+        with self._lock:
+            profile, path = self._profile, self._path
+        try:
+            profile.dump_stats(path)
+            _LOGGER.info("Profile written to {}".format(path))
+        except OSError as e:
+            _LOGGER.error("Cannot write profile to {} ({})".format(path, e))
+        finally:
+            with self._lock:
+                self._profile = None
+
+
+TRACER = Tracer()
+PROFILER = CycleProfiler()